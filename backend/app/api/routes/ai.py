@@ -1,8 +1,12 @@
-from app.core.config import PREBUILT_AI_USER_ID
+import asyncio
+from app.core.config import OPENAI_API_KEY, PREBUILT_AI_USER_ID
+from app.core.memory_manager import ensure_user_memory_loaded
+from app.core.openai_client import get_openai_client
 from app.core.stream_client import server_client
-from app.schemas.ai import NewMessageRequest
-from app.services.ai.helpers import clean_channel_id
-from app.services.ai.openai_agent import OpenAIAgent
+from app.schemas.ai import NewMessageRequest, WarmChannelRequest
+from app.services.ai.helpers import clean_channel_id, get_last_messages_from_channel
+from app.services.ai.openai_agent import CHAT_MODEL, OpenAIAgent
+from app.services.ai.warm_cache import get_channel_generation, pop_warm_state, store_warm_state
 from fastapi import APIRouter, HTTPException
 
 router = APIRouter()
@@ -15,9 +19,11 @@ async def ai_new_message(request: NewMessageRequest):
     It:
       - Validates and cleans the channel id.
       - Retrieves the channel.
-      - Ensures the prebuilt AI user is a member.
-      - Updates user memory in background.
-      - Creates an OpenAIAgent to process and stream the AI response.
+      - Ensures the prebuilt AI user is a member (skipped if the channel was warmed).
+      - Queues the message for offline memory consolidation (or, in interactive mode,
+        updates user memory in background).
+      - Creates an OpenAIAgent to process and stream the AI response,
+        reusing the warmed history and OpenAI client when available.
     """
     print("[DEBUG] Received new-message request:")
     print(request)
@@ -45,15 +51,87 @@ async def ai_new_message(request: NewMessageRequest):
         print(f"[ERROR] Error retrieving channel: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving channel: {str(e)}")
 
+    # Pick up the state prefetched by /warm, if it is still fresh.
+    warm_state = pop_warm_state(channel_id)
+
     # Ensure the prebuilt AI user is a member of the channel.
-    try:
-        print(f"[DEBUG] Adding prebuilt AI user '{PREBUILT_AI_USER_ID}' as a member...")
-        await channel.add_members([PREBUILT_AI_USER_ID])
-        print("[DEBUG] Successfully added AI user to channel.")
-    except Exception as e:
-        print(f"[WARNING] Could not add AI user to channel: {e}")
+    if warm_state and warm_state["ai_member"]:
+        print("[DEBUG] AI user membership already ensured during warm-up.")
+    else:
+        try:
+            print(f"[DEBUG] Adding prebuilt AI user '{PREBUILT_AI_USER_ID}' as a member...")
+            await channel.add_members([PREBUILT_AI_USER_ID])
+            print("[DEBUG] Successfully added AI user to channel.")
+        except Exception as e:
+            print(f"[WARNING] Could not add AI user to channel: {e}")
 
     # Instantiate the OpenAIAgent and let it process the message.
     agent = OpenAIAgent(chat_client=server_client, channel=channel)
-    await agent.handle_message(request, user_id)
+    await agent.handle_message(
+        request, user_id, prefetched_history=warm_state["history"] if warm_state else None
+    )
     return {"message": "Message processing started."}
+
+
+@router.post("/warm")
+async def ai_warm_channel(request: WarmChannelRequest):
+    """
+    Endpoint called when a user opens a chat, before the first message.
+    It prefetches everything the first reply needs so it is not paid on the request path:
+      - Retrieves the channel history.
+      - Ensures the prebuilt AI user is a member.
+      - Loads the user's memory into the in-memory cache.
+      - Pre-opens the shared OpenAI client's connection.
+    The warmed state is consumed by the next new-message and expires after a short TTL.
+    A warm-up that finishes after a message already arrived on the channel is discarded.
+    """
+    if not request.cid:
+        raise HTTPException(status_code=400, detail="Missing required field: cid")
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+
+    channel_id = clean_channel_id(request.cid)
+    generation = get_channel_generation(channel_id)
+    try:
+        channel = server_client.channel("messaging", channel_id)
+    except Exception as e:
+        print(f"[ERROR] Error retrieving channel: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving channel: {str(e)}")
+
+    async def load_user_memory():
+        # Memories are loaded at startup; this only covers users registered since then.
+        if request.user and request.user.get("id"):
+            try:
+                await asyncio.to_thread(ensure_user_memory_loaded, request.user["id"])
+            except Exception as e:
+                print(f"[WARNING] Could not load user memory during warm-up: {e}")
+
+    async def ensure_ai_member() -> bool:
+        try:
+            await channel.add_members([PREBUILT_AI_USER_ID])
+            return True
+        except Exception as e:
+            print(f"[WARNING] Could not add AI user to channel during warm-up: {e}")
+            return False
+
+    async def prefetch_history():
+        try:
+            return await get_last_messages_from_channel(server_client, channel.cid, limit=50)
+        except Exception as e:
+            # Leave history to be fetched on the first message instead.
+            print(f"[WARNING] Could not prefetch conversation history: {e}")
+            return None
+
+    async def open_openai_connection():
+        try:
+            # A cheap request that establishes a pooled TLS connection on the shared client.
+            await get_openai_client().models.retrieve(CHAT_MODEL)
+        except Exception as e:
+            print(f"[WARNING] Could not pre-open OpenAI connection: {e}")
+
+    ai_member, history, _, _ = await asyncio.gather(
+        ensure_ai_member(), prefetch_history(), load_user_memory(), open_openai_connection()
+    )
+    store_warm_state(channel_id, generation, history, ai_member)
+    print(f"[DEBUG] Warmed channel: {channel_id}")
+    return {"message": "Channel warmed."}
@@ -17,4 +17,21 @@ DB_PATH = os.getenv("DB_PATH", "stream_chat_app.db")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Prebuilt AI user ID
-PREBUILT_AI_USER_ID = os.getenv("PREBUILT_AI_USER_ID")
\ No newline at end of file
+PREBUILT_AI_USER_ID = os.getenv("PREBUILT_AI_USER_ID")
+
+# How long (in seconds) a warmed channel stays valid before the first message
+WARM_CACHE_TTL_SECONDS = int(os.getenv("WARM_CACHE_TTL_SECONDS", "60"))
+
+# Memory update mode: "batch" (queued, consolidated offline via the Batch API) or "interactive" (real-time)
+MEMORY_UPDATE_MODE = os.getenv("MEMORY_UPDATE_MODE", "batch")
+MEMORY_UPDATE_MODES = {"batch", "interactive"}
+if MEMORY_UPDATE_MODE not in MEMORY_UPDATE_MODES:
+    raise ValueError(
+        f"Invalid MEMORY_UPDATE_MODE '{MEMORY_UPDATE_MODE}', expected one of: {', '.join(sorted(MEMORY_UPDATE_MODES))}"
+    )
+
+# How often (in seconds) the memory consolidation job runs
+MEMORY_BATCH_INTERVAL_SECONDS = int(os.getenv("MEMORY_BATCH_INTERVAL_SECONDS", "3600"))
+
+# Directory where memory batch JSONL files are written
+MEMORY_BATCH_DIR = os.getenv("MEMORY_BATCH_DIR", "memory_batches")
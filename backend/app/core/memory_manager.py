@@ -30,3 +30,18 @@ def save_user_memories():
         print("[DEBUG] User memories saved to DB.")
     finally:
         db.close()
+
+
+def ensure_user_memory_loaded(user_id: str) -> str:
+    """Load a single user's memory from the DB if it is not cached in memory yet."""
+    if user_id in user_memories:
+        return user_memories[user_id]
+
+    db = SessionLocal()
+    try:
+        user_obj = db.query(User).filter(User.username == user_id).first()
+        user_memories[user_id] = user_obj.memory if user_obj and user_obj.memory else ""
+        print(f"[DEBUG] Loaded memory for user: {user_id}")
+    finally:
+        db.close()
+    return user_memories[user_id]
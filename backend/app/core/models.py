@@ -14,3 +14,14 @@ class User(Base):
     disabled = Column(Boolean, default=False)
     created_at = Column(DateTime, server_default=func.now())
     memory = Column(Text, default="")
+
+
+class PendingMemoryMessage(Base):
+    """A user message queued for the next offline memory consolidation batch."""
+    __tablename__ = "pending_memory_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, index=True, nullable=False)
+    content = Column(Text, nullable=False)
+    batch_id = Column(String, index=True, nullable=True)  # Set once submitted to the Batch API
+    created_at = Column(DateTime, server_default=func.now())
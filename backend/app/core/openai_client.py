@@ -0,0 +1,37 @@
+import httpx
+from app.core.config import OPENAI_API_KEY, WARM_CACHE_TTL_SECONDS
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from typing import Optional
+
+# Keep idle connections open at least as long as a warmed channel stays valid (httpx
+# defaults to 5s), so the connection pre-opened by /api/ai/warm survives until the first message.
+OPENAI_HTTP_LIMITS = httpx.Limits(
+    max_connections=1000,
+    max_keepalive_connections=100,
+    keepalive_expiry=max(WARM_CACHE_TTL_SECONDS, 5),
+)
+
+# Single OpenAI client shared by all requests so its connection pool stays warm.
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Return the shared async OpenAI client, creating it on first use."""
+    global _openai_client
+    if not OPENAI_API_KEY:
+        raise ValueError("OpenAI API key not configured")
+    if _openai_client is None:
+        print("Creating OpenAI async client instance")
+        _openai_client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=DefaultAsyncHttpxClient(limits=OPENAI_HTTP_LIMITS),
+        )
+    return _openai_client
+
+
+async def close_openai_client():
+    """Close the shared OpenAI client (called on app shutdown)."""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
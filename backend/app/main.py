@@ -1,7 +1,11 @@
+import asyncio
 from app.api.routes import ai
 from app.api.routes import auth  # Import auth routes
+from app.core.config import MEMORY_UPDATE_MODE
 from app.core.database import init_db
 from app.core.memory_manager import load_user_memories, save_user_memories
+from app.core.openai_client import close_openai_client
+from app.services.ai.memory_batch import memory_consolidation_loop
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -20,11 +24,24 @@ app.add_middleware(
 async def startup_event():
     init_db()
     load_user_memories()
+    # Consolidate queued memory updates offline via the Batch API.
+    app.state.memory_consolidation_task = None
+    if MEMORY_UPDATE_MODE != "interactive":
+        app.state.memory_consolidation_task = asyncio.create_task(memory_consolidation_loop())
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    task = app.state.memory_consolidation_task
+    if task:
+        # Waits for a batch submission in progress to be recorded before shutting down.
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
     save_user_memories()
+    await close_openai_client()
 
 
 app.include_router(auth.router, prefix="/api/auth")
@@ -6,3 +6,8 @@ class NewMessageRequest(BaseModel):
     cid: Optional[str]
     type: Optional[str]
     message: Optional[Dict]
+
+
+class WarmChannelRequest(BaseModel):
+    cid: Optional[str]
+    user: Optional[Dict] = None
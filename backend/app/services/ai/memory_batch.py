@@ -0,0 +1,306 @@
+import asyncio
+import json
+import os
+import time
+from app.core.config import MEMORY_BATCH_DIR, MEMORY_BATCH_INTERVAL_SECONDS
+from app.core.database import SessionLocal
+from app.core.memory_manager import ensure_user_memory_loaded, user_memories
+from app.core.models import PendingMemoryMessage, User
+from app.core.openai_client import get_openai_client
+from app.services.ai.memory_service import MEMORY_MAX_TOKENS, MEMORY_MODEL, build_memory_update_prompt
+from openai import AsyncOpenAI
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+MAX_REQUESTS_PER_BATCH = 50000  # Batch API limit on requests per input file
+APPLY_CHUNK_SIZE = 500  # Number of memories written per DB transaction
+TERMINAL_BATCH_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class OpenAIBatchClient:
+    """Submits memory batch files to the OpenAI Batch API and reads back their results."""
+
+    def __init__(self, openai_client: Optional[AsyncOpenAI] = None):
+        self.openai = openai_client or get_openai_client()
+
+    async def submit(self, input_path: str) -> str:
+        """Upload the JSONL file and create a batch for it. Returns the batch id."""
+        with open(input_path, "rb") as f:
+            batch_file = await self.openai.files.create(file=f, purpose="batch")
+        batch = await self.openai.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def get_batch(self, batch_id: str) -> Dict[str, Any]:
+        """Return the batch status and output file id."""
+        batch = await self.openai.batches.retrieve(batch_id)
+        return {"status": batch.status, "output_file_id": batch.output_file_id}
+
+    async def iter_output_lines(self, file_id: str) -> AsyncIterator[str]:
+        """Stream the output file line by line instead of loading it whole."""
+        async with self.openai.files.with_streaming_response.content(file_id) as response:
+            async for line in response.iter_lines():
+                yield line
+
+
+class LocalBatchClient:
+    """
+    In-process stand-in for the Batch API, used in tests and offline development.
+    Every batch completes immediately; `responder` maps a request body to the new memory
+    (by default it returns the prompt itself, which is enough to check the wiring).
+    """
+
+    def __init__(self, output_dir: str = MEMORY_BATCH_DIR,
+                 responder: Optional[Callable[[Dict[str, Any]], str]] = None):
+        self.output_dir = output_dir
+        self.responder = responder or (lambda body: body["messages"][-1]["content"])
+        self.batches: Dict[str, Dict[str, Any]] = {}
+
+    async def submit(self, input_path: str) -> str:
+        batch_id = f"local-batch-{len(self.batches) + 1}"
+        output_path = os.path.join(self.output_dir, f"{batch_id}-output.jsonl")
+        with open(input_path) as src, open(output_path, "w") as dst:
+            for line in src:
+                request = json.loads(line)
+                dst.write(json.dumps({
+                    "id": f"{batch_id}-{request['custom_id']}",
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {
+                            "role": "assistant", "content": self.responder(request["body"])
+                        }}]},
+                    },
+                    "error": None,
+                }) + "\n")
+        self.batches[batch_id] = {"status": "completed", "output_file_id": output_path}
+        return batch_id
+
+    async def get_batch(self, batch_id: str) -> Dict[str, Any]:
+        # Batches unknown to this process (e.g. after a restart) are treated as expired.
+        return self.batches.get(batch_id, {"status": "expired", "output_file_id": None})
+
+    async def iter_output_lines(self, file_id: str) -> AsyncIterator[str]:
+        with open(file_id) as f:
+            for line in f:
+                yield line
+
+
+def enqueue_memory_message(user_id: str, message: str):
+    """Log a user's message to the local queue for the next consolidation batch."""
+    db = SessionLocal()
+    try:
+        db.add(PendingMemoryMessage(user_id=user_id, content=message))
+        db.commit()
+    finally:
+        db.close()
+
+
+def build_batch_file(output_dir: str = MEMORY_BATCH_DIR) -> Tuple[Optional[str], List[int]]:
+    """
+    Write one JSONL batch file covering every user with queued messages.
+    Users that already have messages in an in-flight batch are skipped, so each
+    prompt is built on top of the latest consolidated memory.
+    Returns the file path and the ids of the queued messages it covers,
+    or (None, []) when there is nothing to submit.
+    """
+    db = SessionLocal()
+    try:
+        in_flight_users = {
+            user_id for (user_id,) in
+            db.query(PendingMemoryMessage.user_id).filter(PendingMemoryMessage.batch_id.isnot(None)).distinct()
+        }
+        pending = (
+            db.query(PendingMemoryMessage)
+            .filter(PendingMemoryMessage.batch_id.is_(None))
+            .order_by(PendingMemoryMessage.id)
+            .all()
+        )
+    finally:
+        db.close()
+
+    messages_by_user: Dict[str, List[PendingMemoryMessage]] = {}
+    for message in pending:
+        if message.user_id in in_flight_users:
+            continue
+        if message.user_id not in messages_by_user and len(messages_by_user) >= MAX_REQUESTS_PER_BATCH:
+            continue
+        messages_by_user.setdefault(message.user_id, []).append(message)
+
+    if not messages_by_user:
+        return None, []
+
+    os.makedirs(output_dir, exist_ok=True)
+    input_path = os.path.join(output_dir, f"memory-batch-{int(time.time())}.jsonl")
+    message_ids: List[int] = []
+    with open(input_path, "w") as f:
+        for user_id, messages in messages_by_user.items():
+            prompt = build_memory_update_prompt(
+                ensure_user_memory_loaded(user_id), [m.content for m in messages]
+            )
+            f.write(json.dumps({
+                "custom_id": user_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": MEMORY_MODEL,
+                    "messages": [{"role": "system", "content": prompt}],
+                    "max_tokens": MEMORY_MAX_TOKENS,
+                },
+            }) + "\n")
+            message_ids.extend(m.id for m in messages)
+
+    print(f"[DEBUG] Built memory batch file {input_path} for {len(messages_by_user)} users.")
+    return input_path, message_ids
+
+
+async def submit_pending_memory_batch(batch_client) -> Optional[str]:
+    """Build a batch file from the queue, submit it and mark the covered messages as in flight."""
+    # DB and file work run in a thread so chat responses keep streaming meanwhile.
+    input_path, message_ids = await asyncio.to_thread(build_batch_file)
+    if not input_path:
+        return None
+
+    # Once uploaded, the batch must be recorded against its messages or they would be
+    # billed and submitted again, so this step is shielded from cancellation (e.g. shutdown).
+    submission = asyncio.ensure_future(_submit_and_mark_batch(batch_client, input_path, message_ids))
+    try:
+        return await asyncio.shield(submission)
+    except asyncio.CancelledError:
+        await submission
+        raise
+
+
+async def _submit_and_mark_batch(batch_client, input_path: str, message_ids: List[int]) -> str:
+    try:
+        batch_id = await batch_client.submit(input_path)
+    finally:
+        os.remove(input_path)
+
+    await asyncio.to_thread(mark_batch_messages, message_ids, batch_id)
+    print(f"[DEBUG] Submitted memory batch {batch_id} covering {len(message_ids)} messages.")
+    return batch_id
+
+
+def mark_batch_messages(message_ids: List[int], batch_id: str):
+    """Attach queued messages to the batch they were submitted in."""
+    db = SessionLocal()
+    try:
+        db.query(PendingMemoryMessage).filter(PendingMemoryMessage.id.in_(message_ids)).update(
+            {PendingMemoryMessage.batch_id: batch_id}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def apply_memory_updates(updates: Dict[str, str], batch_id: str):
+    """Write consolidated memories in one transaction and drop the messages they cover."""
+    db = SessionLocal()
+    try:
+        for user_obj in db.query(User).filter(User.username.in_(list(updates))):
+            user_obj.memory = updates[user_obj.username]
+        db.query(PendingMemoryMessage).filter(
+            PendingMemoryMessage.batch_id == batch_id,
+            PendingMemoryMessage.user_id.in_(list(updates)),
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    user_memories.update(updates)
+
+
+def requeue_batch_messages(batch_id: str):
+    """Return any messages still attached to a finished batch to the queue."""
+    db = SessionLocal()
+    try:
+        requeued = db.query(PendingMemoryMessage).filter(PendingMemoryMessage.batch_id == batch_id).update(
+            {PendingMemoryMessage.batch_id: None}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    if requeued:
+        print(f"[WARNING] Requeued {requeued} messages from memory batch {batch_id}.")
+
+
+async def collect_memory_batch(batch_client, batch_id: str) -> bool:
+    """
+    Apply the results of a finished batch to User.memory.
+    Output lines are parsed as they stream in and written in chunks of APPLY_CHUNK_SIZE.
+    Returns False while the batch is still running.
+    """
+    batch = await batch_client.get_batch(batch_id)
+    if batch["status"] not in TERMINAL_BATCH_STATUSES:
+        return False
+
+    applied = 0
+    if batch["output_file_id"]:
+        updates: Dict[str, str] = {}
+        async for line in batch_client.iter_output_lines(batch["output_file_id"]):
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if result.get("error") or response.get("status_code") != 200:
+                    print(f"[WARNING] Memory batch request {result.get('custom_id')} failed: {result.get('error')}")
+                    continue
+                updates[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+            except (ValueError, KeyError, IndexError) as e:
+                print(f"[WARNING] Could not parse memory batch result: {e}")
+                continue
+
+            if len(updates) >= APPLY_CHUNK_SIZE:
+                await asyncio.to_thread(apply_memory_updates, updates, batch_id)
+                applied += len(updates)
+                updates = {}
+        if updates:
+            await asyncio.to_thread(apply_memory_updates, updates, batch_id)
+            applied += len(updates)
+
+    # Anything not applied (failed requests, expired or failed batch) goes back into the queue.
+    await asyncio.to_thread(requeue_batch_messages, batch_id)
+    print(f"[DEBUG] Memory batch {batch_id} finished with status '{batch['status']}', "
+          f"applied {applied} memories.")
+    return True
+
+
+def get_in_flight_batch_ids() -> List[str]:
+    db = SessionLocal()
+    try:
+        return [
+            batch_id for (batch_id,) in
+            db.query(PendingMemoryMessage.batch_id).filter(PendingMemoryMessage.batch_id.isnot(None)).distinct()
+        ]
+    finally:
+        db.close()
+
+
+async def run_consolidation_cycle(batch_client):
+    """Collect any finished batches, then submit the messages queued since the last cycle."""
+    for batch_id in await asyncio.to_thread(get_in_flight_batch_ids):
+        try:
+            await collect_memory_batch(batch_client, batch_id)
+        except Exception as e:
+            print(f"[ERROR] Could not collect memory batch {batch_id}: {e}")
+    await submit_pending_memory_batch(batch_client)
+
+
+async def memory_consolidation_loop(batch_client=None, interval: int = MEMORY_BATCH_INTERVAL_SECONDS):
+    """Run the consolidation job on a schedule until cancelled."""
+    try:
+        batch_client = batch_client or OpenAIBatchClient()
+    except ValueError as e:
+        print(f"[ERROR] Memory consolidation disabled: {e}")
+        return
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_consolidation_cycle(batch_client)
+        except Exception as e:
+            print(f"[ERROR] Memory consolidation cycle failed: {e}")
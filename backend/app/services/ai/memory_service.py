@@ -1,3 +1,25 @@
+from typing import List
+
+MEMORY_MODEL = "gpt-4o-mini"
+MEMORY_MAX_TOKENS = 256
+
+
+def build_memory_update_prompt(current_memory: str, new_messages: List[str]) -> str:
+    """Build the prompt asking the model to fold new user messages into the current memory."""
+    if len(new_messages) == 1:
+        subject = "message"
+        messages_text = f"New message: {new_messages[0]}"
+    else:
+        subject = "messages"
+        messages_text = "New messages:\n" + "\n".join(f"- {message}" for message in new_messages)
+    return (
+        f"Extract useful information from the following {subject} that could help build a long-term context "
+        f"for this user to achieve their goals. The current memory is:\n\n{current_memory}\n\n"
+        f"{messages_text}\n\n"
+        "Return the updated memory as a plain text paragraph."
+    )
+
+
 async def update_user_memory(openai_client, prompt: str) -> str:
     """
     Use OpenAI to process the given prompt and extract/update the user's memory.
@@ -5,9 +27,9 @@ async def update_user_memory(openai_client, prompt: str) -> str:
     """
     try:
         response = await openai_client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MEMORY_MODEL,
             messages=[{"role": "system", "content": prompt}],
-            max_tokens=256,
+            max_tokens=MEMORY_MAX_TOKENS,
             stream=False,
         )
         # Extract the content from the first message.
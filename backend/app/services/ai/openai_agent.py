@@ -1,13 +1,18 @@
 import asyncio
-from app.core.config import OPENAI_API_KEY, PREBUILT_AI_USER_ID
+from app.core.config import MEMORY_UPDATE_MODE, PREBUILT_AI_USER_ID
 from app.core.memory_manager import user_memories
+from app.core.openai_client import get_openai_client
 from app.core.stream_client import server_client
 from app.schemas.ai import NewMessageRequest
-from app.services.ai.helpers import get_last_messages_from_channel
-from app.services.ai.memory_service import update_user_memory
+from app.services.ai.helpers import clean_channel_id, get_last_messages_from_channel
+from app.services.ai.memory_batch import enqueue_memory_message
+from app.services.ai.memory_service import build_memory_update_prompt, update_user_memory
+from app.services.ai.warm_cache import invalidate_warm_state
 from fastapi import HTTPException
 from openai import AsyncOpenAI
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional
+
+CHAT_MODEL = "gpt-4o-mini"
 
 
 class OpenAIAgent:
@@ -16,10 +21,9 @@ class OpenAIAgent:
     It manages its own state and handles each streaming chunk.
     """
 
-    def __init__(self, chat_client, channel):
-        if not OPENAI_API_KEY:
-            raise ValueError("OpenAI API key not configured")
-        self.openai = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, chat_client, channel, openai_client: Optional[AsyncOpenAI] = None):
+        # The shared client keeps its connection pool warm across requests.
+        self.openai = openai_client or get_openai_client()
         self.chat_client = chat_client
         self.channel = channel
 
@@ -31,42 +35,53 @@ class OpenAIAgent:
         """Dispose of the agent."""
         self.channel = None
         # await self.chat_client.close()
-        await self.openai.close()
+        # The shared OpenAI client is closed on app shutdown, not per agent.
+        self.openai = None
 
-    async def handle_message(self, request: NewMessageRequest, user_id: str):
+    async def handle_message(
+            self, request: NewMessageRequest, user_id: str,
+            prefetched_history: Optional[List[Dict[str, str]]] = None
+    ):
         """
         Process a new incoming message:
           - Validate the message.
-          - Launch a background task to update user memory using the helper.
-          - Retrieve conversation history via the helper.
+          - Queue the message for memory consolidation (or, in interactive mode,
+            launch a background task to update user memory using the helper).
+          - Retrieve conversation history via the helper (unless prefetched by warm-up).
           - Build a system prompt using the current memory.
           - Send an empty AI message to the channel.
           - Stream the OpenAI response and handle each chunk.
+          - Invalidate any warm-up taken while the reply was streaming.
         """
         # Validate incoming message text.
         if not request.message or "text" not in request.message:
             raise HTTPException(status_code=400, detail="Missing message text")
         user_message = request.message["text"]
 
-        # Retrieve current memory and prepare a prompt for memory update.
         current_memory = user_memories.get(user_id, "")
-        update_prompt = (
-            f"Extract useful information from the following message that could help build a long-term context "
-            f"for this user to achieve their goals. The current memory is:\n\n{current_memory}\n\n"
-            f"New message: {user_message}\n\n"
-            "Return the updated memory as a plain text paragraph."
-        )
-
-        # Launch the update in the background (helper remains external)
-        async def update_memory_background():
-            try:
-                new_memory = await update_user_memory(self.openai, update_prompt)
-                user_memories[user_id] = new_memory
-                print(f"[DEBUG] Background updated memory: {new_memory}")
-            except Exception as e:
-                print(f"[ERROR] Background memory update error: {e}")
 
-        asyncio.create_task(update_memory_background())
+        if MEMORY_UPDATE_MODE == "interactive":
+            # Low-latency path: update the memory right away in the background.
+            update_prompt = build_memory_update_prompt(current_memory, [user_message])
+
+            async def update_memory_background():
+                try:
+                    new_memory = await update_user_memory(self.openai, update_prompt)
+                    user_memories[user_id] = new_memory
+                    print(f"[DEBUG] Background updated memory: {new_memory}")
+                except Exception as e:
+                    print(f"[ERROR] Background memory update error: {e}")
+
+            asyncio.create_task(update_memory_background())
+        else:
+            # Queue the message for the offline consolidation batch, off the reply path.
+            async def enqueue_memory_background():
+                try:
+                    await asyncio.to_thread(enqueue_memory_message, user_id, user_message)
+                except Exception as e:
+                    print(f"[ERROR] Could not queue message for memory consolidation: {e}")
+
+            asyncio.create_task(enqueue_memory_background())
 
         # Build system prompt using current memory.
         system_prompt = {
@@ -80,13 +95,17 @@ class OpenAIAgent:
 
         # Retrieve conversation history (up to 50 messages) using an external helper.
         history: List[Dict[str, str]] = []
-        try:
-            history = await get_last_messages_from_channel(
-                server_client, self.channel.cid, limit=50
-            )
-            print(f"[DEBUG] Retrieved conversation history with {len(history)} messages.")
-        except Exception as e:
-            print(f"[WARNING] Could not retrieve conversation history: {e}")
+        if prefetched_history is not None:
+            history = list(prefetched_history)
+            print(f"[DEBUG] Using prefetched conversation history with {len(history)} messages.")
+        else:
+            try:
+                history = await get_last_messages_from_channel(
+                    server_client, self.channel.cid, limit=50
+                )
+                print(f"[DEBUG] Retrieved conversation history with {len(history)} messages.")
+            except Exception as e:
+                print(f"[WARNING] Could not retrieve conversation history: {e}")
 
         # Prepend system prompt and append the current user message.
         # Prepend system prompt to conversation history.
@@ -121,7 +140,7 @@ class OpenAIAgent:
             openai_stream = await self.openai.chat.completions.create(
                 max_tokens=1024,
                 messages=list(history),  # reverse history so the most recent messages come first
-                model="gpt-4o-mini",
+                model=CHAT_MODEL,
                 stream=True,
             )
 
@@ -145,6 +164,10 @@ class OpenAIAgent:
                 },
                 PREBUILT_AI_USER_ID,
             )
+        finally:
+            # The reply is now part of the history, so any warm-up taken while it was
+            # streaming holds a truncated snapshot.
+            invalidate_warm_state(clean_channel_id(self.channel.cid))
 
     async def handle(self, chunk: Any, message_id: str, bot_id: str):
         """
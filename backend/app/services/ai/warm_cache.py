@@ -0,0 +1,72 @@
+import time
+from app.core.config import WARM_CACHE_TTL_SECONDS
+from typing import Any, Dict, List, Optional
+
+# Global dictionary to hold warmed channel state: {channel_id: state}
+warmed_channels: Dict[str, Dict[str, Any]] = {}
+
+# Per-channel generation, bumped by every new message and finished reply: {channel_id: generation}
+# A warm-up that started before the latest change to the channel is stale and gets dropped.
+channel_generations: Dict[str, int] = {}
+
+
+def get_channel_generation(channel_id: str) -> int:
+    """Return the current generation of a channel; read it before prefetching."""
+    return channel_generations.get(channel_id, 0)
+
+
+def prune_expired_channels():
+    """Drop every warmed channel whose TTL has passed."""
+    now = time.monotonic()
+    expired = [cid for cid, state in warmed_channels.items() if state["expires_at"] <= now]
+    for channel_id in expired:
+        warmed_channels.pop(channel_id, None)
+    if expired:
+        print(f"[DEBUG] Pruned {len(expired)} expired warmed channels.")
+
+
+def store_warm_state(
+        channel_id: str, generation: int, history: Optional[List[Dict[str, str]]], ai_member: bool
+):
+    """
+    Cache the prefetched state for a channel for WARM_CACHE_TTL_SECONDS.
+    The state is dropped if the channel was invalidated since `generation` was read,
+    since its history snapshot would then be missing the latest exchanges.
+    Re-warming a channel replaces any previous state.
+    """
+    prune_expired_channels()
+    if generation != get_channel_generation(channel_id):
+        print(f"[DEBUG] Dropping stale warm-up for channel: {channel_id}")
+        return
+
+    warmed_channels[channel_id] = {
+        "history": history,
+        "ai_member": ai_member,
+        "expires_at": time.monotonic() + WARM_CACHE_TTL_SECONDS,
+    }
+
+
+def invalidate_warm_state(channel_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Mark the channel history as changed: drop any warmed state and make
+    warm-ups still in flight stale. Returns the dropped state, if any.
+    Called when a new message arrives and when the AI reply to it is complete.
+    """
+    channel_generations[channel_id] = get_channel_generation(channel_id) + 1
+    return warmed_channels.pop(channel_id, None)
+
+
+def pop_warm_state(channel_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Take the warmed state for a channel, if any, on a new message.
+    The state is single-use: it only serves the first message after warm-up, and
+    any warm-up still in flight for the channel is invalidated.
+    Returns None when the channel was never warmed or the state has expired.
+    """
+    state = invalidate_warm_state(channel_id)
+    if state is None:
+        return None
+    if state["expires_at"] <= time.monotonic():
+        print(f"[DEBUG] Warmed state for channel {channel_id} has expired.")
+        return None
+    return state
@@ -0,0 +1,22 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway database and dummy credentials before any app module is imported.
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("STREAM_API_KEY", "test-key")
+os.environ.setdefault("STREAM_API_SECRET", "test-secret")
+os.environ.setdefault("PREBUILT_AI_USER_ID", "ai-bot")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def _import_stream_client():
+    # StreamChatAsync opens its HTTP session on import, which needs a running loop
+    # (uvicorn provides one when it loads the app). Tests never use that session.
+    import app.core.stream_client  # noqa: F401
+
+
+asyncio.run(_import_stream_client())
@@ -0,0 +1,140 @@
+import pytest
+from app.api.routes import ai as ai_routes
+from app.main import app
+from app.services.ai import warm_cache
+from fastapi.testclient import TestClient
+from types import SimpleNamespace
+
+HISTORY = [{"role": "user", "content": "earlier"}]
+
+
+class FakeChannel:
+    cid = "messaging:chan"
+
+    def __init__(self, fail_add_members=False):
+        self.fail_add_members = fail_add_members
+        self.added_members = []
+
+    async def add_members(self, members):
+        if self.fail_add_members:
+            raise RuntimeError("stream unavailable")
+        self.added_members.append(members)
+
+
+class FakeAgent:
+    instances = []
+
+    def __init__(self, chat_client, channel):
+        self.channel = channel
+        self.calls = []
+        FakeAgent.instances.append(self)
+
+    async def handle_message(self, request, user_id, prefetched_history=None):
+        self.calls.append((request.message["text"], user_id, prefetched_history))
+
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    warm_cache.warmed_channels.clear()
+    warm_cache.channel_generations.clear()
+    FakeAgent.instances.clear()
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    """Stub the Stream channel, history lookup, memory load and OpenAI client used by the routes."""
+    stubs = SimpleNamespace(
+        channel=FakeChannel(), history=HISTORY, loaded_users=[], retrieved_models=[]
+    )
+
+    async def lookup(chat_client, channel_id, limit):
+        assert channel_id == "messaging:chan"
+        if isinstance(stubs.history, Exception):
+            raise stubs.history
+        return stubs.history
+
+    async def retrieve(model):
+        stubs.retrieved_models.append(model)
+
+    monkeypatch.setattr(ai_routes.server_client, "channel", lambda channel_type, channel_id: stubs.channel)
+    monkeypatch.setattr(ai_routes, "get_last_messages_from_channel", lookup)
+    monkeypatch.setattr(ai_routes, "ensure_user_memory_loaded", stubs.loaded_users.append)
+    monkeypatch.setattr(
+        ai_routes, "get_openai_client", lambda: SimpleNamespace(models=SimpleNamespace(retrieve=retrieve))
+    )
+    monkeypatch.setattr(ai_routes, "OpenAIAgent", FakeAgent)
+    return stubs
+
+
+def post_message(client, text="hello"):
+    return client.post("/api/ai/new-message", json={
+        "cid": "messaging:chan",
+        "type": "message.new",
+        "message": {"text": text, "user": {"id": "alice"}},
+    })
+
+
+def test_warm_prefetches_channel_state(stubs):
+    client = TestClient(app)
+
+    response = client.post("/api/ai/warm", json={"cid": "messaging:chan", "user": {"id": "alice"}})
+
+    assert response.status_code == 200
+    assert stubs.channel.added_members == [[ai_routes.PREBUILT_AI_USER_ID]]
+    assert stubs.loaded_users == ["alice"]
+    assert stubs.retrieved_models == [ai_routes.CHAT_MODEL]
+    state = warm_cache.warmed_channels["chan"]
+    assert state["history"] == HISTORY
+    assert state["ai_member"] is True
+
+
+def test_warm_requires_cid(stubs):
+    response = TestClient(app).post("/api/ai/warm", json={"cid": None})
+
+    assert response.status_code == 400
+    assert warm_cache.warmed_channels == {}
+
+
+def test_warm_falls_back_when_prefetch_fails(stubs):
+    stubs.channel = FakeChannel(fail_add_members=True)
+    stubs.history = RuntimeError("search failed")
+
+    response = TestClient(app).post("/api/ai/warm", json={"cid": "messaging:chan"})
+
+    assert response.status_code == 200
+    state = warm_cache.warmed_channels["chan"]
+    assert state["ai_member"] is False
+    assert state["history"] is None
+
+
+def test_new_message_uses_warm_state(stubs):
+    client = TestClient(app)
+    client.post("/api/ai/warm", json={"cid": "messaging:chan"})
+    stubs.channel.added_members.clear()
+
+    response = post_message(client)
+
+    assert response.status_code == 200
+    assert stubs.channel.added_members == []
+    assert FakeAgent.instances[0].calls == [("hello", "alice", HISTORY)]
+    assert "chan" not in warm_cache.warmed_channels
+
+
+def test_new_message_after_failed_warm_up_takes_normal_path(stubs):
+    stubs.channel = FakeChannel(fail_add_members=True)
+    stubs.history = RuntimeError("search failed")
+    client = TestClient(app)
+    client.post("/api/ai/warm", json={"cid": "messaging:chan"})
+    stubs.channel.fail_add_members = False
+
+    post_message(client)
+
+    assert stubs.channel.added_members == [[ai_routes.PREBUILT_AI_USER_ID]]
+    assert FakeAgent.instances[0].calls == [("hello", "alice", None)]
+
+
+def test_new_message_without_warm_up_adds_ai_member(stubs):
+    post_message(TestClient(app))
+
+    assert stubs.channel.added_members == [[ai_routes.PREBUILT_AI_USER_ID]]
+    assert FakeAgent.instances[0].calls == [("hello", "alice", None)]
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import pytest
+from app.core.database import Base, SessionLocal, engine
+from app.core.memory_manager import user_memories
+from app.core.models import PendingMemoryMessage, User
+from app.services.ai import memory_batch
+from app.services.ai.memory_batch import LocalBatchClient
+
+
+@pytest.fixture(autouse=True)
+def clean_db(tmp_path, monkeypatch):
+    # Batch files are written relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    user_memories.clear()
+    yield
+    user_memories.clear()
+
+
+@pytest.fixture
+def batch_client():
+    os.makedirs(memory_batch.MEMORY_BATCH_DIR, exist_ok=True)
+    return LocalBatchClient(
+        output_dir=memory_batch.MEMORY_BATCH_DIR,
+        # Sections of the prompt: instructions, current memory, new messages, output format.
+        responder=lambda body: "consolidated " + body["messages"][0]["content"].split("\n\n")[2],
+    )
+
+
+def add_user(username, memory=""):
+    db = SessionLocal()
+    try:
+        db.add(User(username=username, email=f"{username}@example.com", hashed_password="x", memory=memory))
+        db.commit()
+    finally:
+        db.close()
+    user_memories[username] = memory
+
+
+def get_memory(username):
+    db = SessionLocal()
+    try:
+        return db.query(User).filter(User.username == username).first().memory
+    finally:
+        db.close()
+
+
+def pending_messages():
+    db = SessionLocal()
+    try:
+        return [(m.user_id, m.content, m.batch_id) for m in db.query(PendingMemoryMessage).order_by(PendingMemoryMessage.id)]
+    finally:
+        db.close()
+
+
+def rewrite_output(batch_client, batch_id, rewrite):
+    output_path = batch_client.batches[batch_id]["output_file_id"]
+    with open(output_path) as f:
+        results = [json.loads(line) for line in f]
+    with open(output_path, "w") as f:
+        for result in results:
+            f.write(json.dumps(rewrite(result)) + "\n")
+
+
+def test_build_batch_file_covers_every_user():
+    add_user("alice", memory="Runs 5k.")
+    add_user("bob")
+    memory_batch.enqueue_memory_message("alice", "I want a marathon")
+    memory_batch.enqueue_memory_message("bob", "Learning Spanish")
+    memory_batch.enqueue_memory_message("alice", "in May")
+
+    input_path, message_ids = memory_batch.build_batch_file()
+
+    with open(input_path) as f:
+        requests = [json.loads(line) for line in f]
+    assert sorted(message_ids) == [1, 2, 3]
+    assert [r["custom_id"] for r in requests] == ["alice", "bob"]
+    for request in requests:
+        assert request["method"] == "POST"
+        assert request["url"] == memory_batch.BATCH_ENDPOINT
+        assert request["body"]["model"] == memory_batch.MEMORY_MODEL
+    alice_prompt = requests[0]["body"]["messages"][0]["content"]
+    assert "Runs 5k." in alice_prompt
+    assert "following messages" in alice_prompt
+    assert "- I want a marathon\n- in May" in alice_prompt
+    bob_prompt = requests[1]["body"]["messages"][0]["content"]
+    assert "following message " in bob_prompt
+    assert "New message: Learning Spanish" in bob_prompt
+
+
+def test_build_batch_file_returns_nothing_for_empty_queue():
+    assert memory_batch.build_batch_file() == (None, [])
+
+
+def test_build_batch_file_skips_users_with_batch_in_flight():
+    add_user("alice")
+    add_user("bob")
+    db = SessionLocal()
+    db.add(PendingMemoryMessage(user_id="alice", content="old", batch_id="batch-1"))
+    db.commit()
+    db.close()
+    memory_batch.enqueue_memory_message("alice", "new")
+    memory_batch.enqueue_memory_message("bob", "hello")
+
+    input_path, _ = memory_batch.build_batch_file()
+
+    with open(input_path) as f:
+        assert [json.loads(line)["custom_id"] for line in f] == ["bob"]
+
+
+def test_cycle_applies_memories_and_drops_covered_messages(batch_client):
+    add_user("alice")
+    add_user("bob")
+    memory_batch.enqueue_memory_message("alice", "I want a marathon")
+    memory_batch.enqueue_memory_message("bob", "Learning Spanish")
+
+    asyncio.run(memory_batch.run_consolidation_cycle(batch_client))
+    assert [batch_id for _, _, batch_id in pending_messages()] == ["local-batch-1", "local-batch-1"]
+    assert not any(name.startswith("memory-batch-") for name in os.listdir(memory_batch.MEMORY_BATCH_DIR))
+
+    # A message arriving while the batch is in flight waits for the next batch.
+    memory_batch.enqueue_memory_message("alice", "in May")
+    asyncio.run(memory_batch.run_consolidation_cycle(batch_client))
+
+    assert get_memory("alice") == "consolidated New message: I want a marathon"
+    assert get_memory("bob") == "consolidated New message: Learning Spanish"
+    assert user_memories["alice"] == get_memory("alice")
+    assert pending_messages() == [("alice", "in May", "local-batch-2")]
+
+
+@pytest.mark.parametrize("status", ["failed", "expired"])
+def test_finished_batch_without_output_is_requeued(batch_client, status):
+    add_user("alice", memory="unchanged")
+    memory_batch.enqueue_memory_message("alice", "hello")
+    batch_id = asyncio.run(memory_batch.submit_pending_memory_batch(batch_client))
+    batch_client.batches[batch_id] = {"status": status, "output_file_id": None}
+
+    assert asyncio.run(memory_batch.collect_memory_batch(batch_client, batch_id)) is True
+
+    assert pending_messages() == [("alice", "hello", None)]
+    assert get_memory("alice") == "unchanged"
+
+
+def test_running_batch_is_left_alone(batch_client):
+    add_user("alice")
+    memory_batch.enqueue_memory_message("alice", "hello")
+    batch_id = asyncio.run(memory_batch.submit_pending_memory_batch(batch_client))
+    batch_client.batches[batch_id]["status"] = "in_progress"
+
+    assert asyncio.run(memory_batch.collect_memory_batch(batch_client, batch_id)) is False
+    assert pending_messages() == [("alice", "hello", batch_id)]
+
+
+def test_failed_request_in_batch_is_requeued(batch_client):
+    add_user("alice", memory="unchanged")
+    add_user("bob")
+    memory_batch.enqueue_memory_message("alice", "hello")
+    memory_batch.enqueue_memory_message("bob", "hi")
+    batch_id = asyncio.run(memory_batch.submit_pending_memory_batch(batch_client))
+
+    def fail_alice(result):
+        if result["custom_id"] == "alice":
+            return {**result, "response": None, "error": {"code": "server_error", "message": "boom"}}
+        return result
+
+    rewrite_output(batch_client, batch_id, fail_alice)
+    asyncio.run(memory_batch.collect_memory_batch(batch_client, batch_id))
+
+    assert pending_messages() == [("alice", "hello", None)]
+    assert get_memory("alice") == "unchanged"
+    assert get_memory("bob") == "consolidated New message: hi"
+
+
+def test_results_are_applied_in_chunks(batch_client, monkeypatch):
+    monkeypatch.setattr(memory_batch, "APPLY_CHUNK_SIZE", 2)
+    applied_chunks = []
+    apply_memory_updates = memory_batch.apply_memory_updates
+
+    def record_chunk(updates, batch_id):
+        applied_chunks.append(sorted(updates))
+        apply_memory_updates(updates, batch_id)
+
+    monkeypatch.setattr(memory_batch, "apply_memory_updates", record_chunk)
+    for name in ["u1", "u2", "u3", "u4", "u5"]:
+        add_user(name)
+        memory_batch.enqueue_memory_message(name, f"message from {name}")
+    batch_id = asyncio.run(memory_batch.submit_pending_memory_batch(batch_client))
+
+    asyncio.run(memory_batch.collect_memory_batch(batch_client, batch_id))
+
+    assert applied_chunks == [["u1", "u2"], ["u3", "u4"], ["u5"]]
+    assert pending_messages() == []
+
+
+def test_cancelled_submission_still_marks_messages(batch_client):
+    add_user("alice")
+    memory_batch.enqueue_memory_message("alice", "hello")
+
+    async def cancel_during_submit():
+        uploading = asyncio.Event()
+        release = asyncio.Event()
+        submit = batch_client.submit
+
+        async def slow_submit(input_path):
+            batch_id = await submit(input_path)
+            uploading.set()
+            await release.wait()
+            return batch_id
+
+        batch_client.submit = slow_submit
+        task = asyncio.create_task(memory_batch.submit_pending_memory_batch(batch_client))
+        await uploading.wait()
+        task.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_during_submit())
+
+    assert pending_messages() == [("alice", "hello", "local-batch-1")]
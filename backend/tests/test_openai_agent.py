@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+import threading
+from app.schemas.ai import NewMessageRequest
+from app.services.ai import openai_agent, warm_cache
+from app.services.ai.openai_agent import OpenAIAgent
+from types import SimpleNamespace
+
+
+@pytest.fixture(autouse=True)
+def clear_warm_cache():
+    warm_cache.warmed_channels.clear()
+    warm_cache.channel_generations.clear()
+
+
+class FakeChannel:
+    cid = "messaging:chan"
+
+    async def send_message(self, message, user_id):
+        return {"message": {"id": "msg-1"}}
+
+    async def send_event(self, event, user_id):
+        pass
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+
+        async def empty_stream():
+            return
+            yield
+
+        return empty_stream()
+
+
+def make_agent():
+    completions = FakeCompletions()
+    openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    agent = OpenAIAgent(chat_client=None, channel=FakeChannel(), openai_client=openai_client)
+    return agent, completions
+
+
+def make_request(text):
+    return NewMessageRequest(cid="messaging:chan", type="message.new", message={"text": text})
+
+
+def test_prefetched_history_skips_history_lookup(monkeypatch):
+    async def fail_lookup(*args, **kwargs):
+        raise AssertionError("history should not be fetched when prefetched")
+
+    monkeypatch.setattr(openai_agent, "get_last_messages_from_channel", fail_lookup)
+    monkeypatch.setattr(openai_agent, "MEMORY_UPDATE_MODE", "interactive")
+    monkeypatch.setattr(openai_agent, "update_user_memory", lambda *args: asyncio.sleep(0, "memory"))
+    agent, completions = make_agent()
+    prefetched = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "reply"}]
+
+    asyncio.run(agent.handle_message(make_request("new"), "user-1", prefetched_history=prefetched))
+
+    messages = completions.calls[0]["messages"]
+    assert messages[0]["role"] == "system"
+    assert messages[1:] == prefetched + [{"role": "user", "content": "new"}]
+    # The cached snapshot itself is left untouched.
+    assert len(prefetched) == 2
+
+
+def test_history_is_fetched_without_prefetch(monkeypatch):
+    async def lookup(chat_client, channel_id, limit):
+        assert channel_id == "messaging:chan"
+        return [{"role": "user", "content": "fetched"}]
+
+    monkeypatch.setattr(openai_agent, "get_last_messages_from_channel", lookup)
+    monkeypatch.setattr(openai_agent, "MEMORY_UPDATE_MODE", "interactive")
+    monkeypatch.setattr(openai_agent, "update_user_memory", lambda *args: asyncio.sleep(0, "memory"))
+    agent, completions = make_agent()
+
+    asyncio.run(agent.handle_message(make_request("new"), "user-1"))
+
+    assert completions.calls[0]["messages"][1:] == [
+        {"role": "user", "content": "fetched"},
+        {"role": "user", "content": "new"},
+    ]
+
+
+def test_finished_reply_invalidates_warm_up_taken_while_streaming(monkeypatch):
+    async def lookup(chat_client, channel_id, limit):
+        return []
+
+    monkeypatch.setattr(openai_agent, "get_last_messages_from_channel", lookup)
+    monkeypatch.setattr(openai_agent, "MEMORY_UPDATE_MODE", "interactive")
+    monkeypatch.setattr(openai_agent, "update_user_memory", lambda *args: asyncio.sleep(0, "memory"))
+    agent, _ = make_agent()
+
+    # One warm-up completes while the reply streams, another is still prefetching.
+    warm_cache.store_warm_state("chan", warm_cache.get_channel_generation("chan"), [], ai_member=True)
+    in_flight_generation = warm_cache.get_channel_generation("chan")
+
+    asyncio.run(agent.handle_message(make_request("new"), "user-1"))
+
+    assert warm_cache.pop_warm_state("chan") is None
+    warm_cache.store_warm_state("chan", in_flight_generation, [], ai_member=True)
+    assert "chan" not in warm_cache.warmed_channels
+
+
+def test_batch_mode_queues_message_without_delaying_reply(monkeypatch):
+    async def lookup(chat_client, channel_id, limit):
+        return []
+
+    reply_started = threading.Event()
+    queued = []
+
+    def enqueue(user_id, message):
+        # Only unblocks once the reply has started, so an inline enqueue would time out.
+        queued.append((user_id, message, reply_started.wait(timeout=2)))
+
+    class RecordingChannel(FakeChannel):
+        async def send_message(self, message, user_id):
+            reply_started.set()
+            return await super().send_message(message, user_id)
+
+    monkeypatch.setattr(openai_agent, "get_last_messages_from_channel", lookup)
+    monkeypatch.setattr(openai_agent, "MEMORY_UPDATE_MODE", "batch")
+    monkeypatch.setattr(openai_agent, "enqueue_memory_message", enqueue)
+    agent, _ = make_agent()
+    agent.channel = RecordingChannel()
+
+    async def run():
+        await agent.handle_message(make_request("new"), "user-1")
+        while not queued:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+    assert queued == [("user-1", "new", True)]
@@ -0,0 +1,15 @@
+import asyncio
+from app.core import openai_client
+from app.core.config import WARM_CACHE_TTL_SECONDS
+
+
+def test_shared_client_keeps_connections_alive_for_warm_ttl():
+    client = openai_client.get_openai_client()
+    try:
+        assert openai_client.get_openai_client() is client
+        # The pooled connection opened by /api/ai/warm must outlive the warmed state.
+        pool = client._client._transport._pool
+        assert pool._keepalive_expiry >= WARM_CACHE_TTL_SECONDS
+        assert pool._keepalive_expiry == openai_client.OPENAI_HTTP_LIMITS.keepalive_expiry
+    finally:
+        asyncio.run(openai_client.close_openai_client())
@@ -0,0 +1,68 @@
+import pytest
+from app.services.ai import warm_cache
+
+HISTORY = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture(autouse=True)
+def clear_warm_cache():
+    warm_cache.warmed_channels.clear()
+    warm_cache.channel_generations.clear()
+
+
+def warm(channel_id, history=HISTORY):
+    generation = warm_cache.get_channel_generation(channel_id)
+    warm_cache.store_warm_state(channel_id, generation, history, ai_member=True)
+
+
+def test_pop_returns_state_once():
+    warm("chan")
+
+    state = warm_cache.pop_warm_state("chan")
+    assert state["history"] == HISTORY
+    assert state["ai_member"] is True
+    assert warm_cache.pop_warm_state("chan") is None
+
+
+def test_pop_returns_none_for_unknown_channel():
+    assert warm_cache.pop_warm_state("chan") is None
+
+
+def test_expired_state_is_not_returned(monkeypatch):
+    monkeypatch.setattr(warm_cache, "WARM_CACHE_TTL_SECONDS", 0)
+    warm("chan")
+
+    assert warm_cache.pop_warm_state("chan") is None
+    assert "chan" not in warm_cache.warmed_channels
+
+
+def test_storing_prunes_expired_channels(monkeypatch):
+    monkeypatch.setattr(warm_cache, "WARM_CACHE_TTL_SECONDS", 0)
+    warm("old")
+    monkeypatch.setattr(warm_cache, "WARM_CACHE_TTL_SECONDS", 60)
+    warm("new")
+
+    assert list(warm_cache.warmed_channels) == ["new"]
+
+
+def test_rewarming_replaces_previous_state():
+    warm("chan", history=[{"role": "user", "content": "first"}])
+    warm("chan", history=[{"role": "user", "content": "second"}])
+
+    assert warm_cache.pop_warm_state("chan")["history"] == [{"role": "user", "content": "second"}]
+
+
+def test_warm_up_started_before_a_message_is_dropped():
+    generation = warm_cache.get_channel_generation("chan")
+    # A message arrives while the warm-up is still prefetching.
+    warm_cache.pop_warm_state("chan")
+    warm_cache.store_warm_state("chan", generation, HISTORY, ai_member=True)
+
+    assert warm_cache.pop_warm_state("chan") is None
+
+
+def test_warm_up_started_after_a_message_is_kept():
+    warm_cache.pop_warm_state("chan")
+    warm("chan")
+
+    assert warm_cache.pop_warm_state("chan") is not None
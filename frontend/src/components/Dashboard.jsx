@@ -104,6 +104,35 @@ function Dashboard() {
         }
     }, [currentUser]);
 
+    // Warm the AI backend for the selected channel so the first reply starts faster
+    useEffect(() => {
+        if (!selectedChannel || !currentUser) return;
+
+        const warmChannel = async () => {
+            try {
+                const response = await fetch(`${import.meta.env.VITE_BACKEND_API_URL}/ai/warm`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Authorization': `Bearer ${currentUser.token}`
+                    },
+                    body: JSON.stringify({
+                        cid: selectedChannel.cid,
+                        user: {id: currentUser.userId},
+                    }),
+                });
+
+                if (!response.ok) {
+                    throw new Error(`Backend responded with status: ${response.status}`);
+                }
+            } catch (error) {
+                console.error('Error warming AI backend:', error);
+            }
+        };
+
+        warmChannel();
+    }, [selectedChannel, currentUser]);
+
     // Listen for new and updated messages and update state
     useEffect(() => {
         if (selectedChannel) {